@@ -1,83 +1,39 @@
+import asyncio
 import boto3
-import json
-import os
-from typing import Dict, Any, Optional, Union
+import botocore.config
+import concurrent.futures
+import functools
+import hashlib
+import orjson
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
 from botocore.exceptions import ClientError, BotoCoreError
 from ..schemas.base import AWSCredentials
+from ..config import get_settings
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class BedrockAgent:
-    def __init__(self):
-        self.session = None
-        self.model_id = os.environ.get('AWS_BEDROCK_MODEL_ID', 'anthropic.claude-v2')
-        logger.info(f"Initialized BedrockAgent with model: {self.model_id}")
+# Maximum number of cached boto3 clients before evicting the least recently used
+_CLIENT_CACHE_MAX_SIZE = 32
 
-    def _init_session(self, credentials: Optional[AWSCredentials] = None) -> Union[str, None]:
-        """Initialize AWS session with provided or default credentials"""
-        try:
-            if credentials:
-                self.session = boto3.Session(
-                    aws_access_key_id=credentials.accessKeyId,
-                    aws_secret_access_key=credentials.secretAccessKey,
-                    region_name=credentials.region
-                )
-            else:
-                raise Exception("AWS credentials are required for this operation")
-            logger.info("AWS session initialized successfully")
-            return None
-        except Exception as e:
-            logger.error(f"Failed to initialize AWS session: {str(e)}")
-            return str(e)
+def _credentials_fingerprint(credentials: AWSCredentials) -> str:
+    """Digest of the secret key so the cache key depends on the full pair
+    without holding the raw secret"""
+    return hashlib.blake2b(credentials.secretAccessKey.encode(), digest_size=16).hexdigest()
 
-    def _get_bedrock_client(self, credentials: Optional[AWSCredentials] = None):
-        """Get Bedrock client with appropriate credentials"""
-        error = self._init_session(credentials)
-        if error:
-            raise Exception(error)
-        return self.session.client('bedrock-runtime')
+# The invoke_model request body is constant apart from the prompt; keep the
+# invariant fields pre-serialized as bytes and splice in the encoded prompt
+_BODY_PREFIX = b'{"max_tokens_to_sample":2048,"temperature":0,"top_p":0.9,"prompt":'
+_BODY_SUFFIX = b'}'
 
-    async def validate_aws_operation(
-        self, 
-        operation: Dict[str, Any],
-        credentials: Optional[AWSCredentials] = None
-    ) -> Dict[str, Any]:
-        """
-        Validates an AWS operation using Claude. This includes checking permissions
-        and validating that the operation is safe to execute.
-        """
-        try:
-            # First validate the credentials have required permissions
-            if credentials:
-                try:
-                    sts = self.session.client('sts')
-                    identity = sts.get_caller_identity()
-                    logger.info(f"Validating operation for AWS user: {identity['Arn']}")
-                except Exception as e:
-                    return {
-                        "is_valid": False,
-                        "security_concerns": [
-                            "Unable to validate AWS credentials"
-                        ],
-                        "best_practice_suggestions": [
-                            "Ensure the provided credentials are valid",
-                            "Ensure the credentials have sufficient permissions"
-                        ],
-                        "parameter_validation": {
-                            "valid_parameters": [],
-                            "invalid_parameters": ["credentials"],
-                            "missing_parameters": []
-                        },
-                        "recommendation": f"Please provide valid AWS credentials. Error: {str(e)}"
-                    }
-
-            prompt = f"""
+# Prompt templates are constant apart from the interpolated values, so build
+# them once at import time and only format the variable part per call
+_VALIDATE_OPERATION_TEMPLATE = """
             Please analyze this AWS operation for potential security issues, best practices, and validate its parameters:
 
-            Operation: {json.dumps(operation, indent=2)}
+            Operation: {operation_json}
 
             Provide your analysis in the following JSON format:
             {{
@@ -91,7 +47,7 @@ class BedrockAgent:
                 }},
                 "recommendation": "string"
             }}
-            
+
             Consider these security aspects:
             1. Principle of least privilege
             2. Resource naming conventions
@@ -100,13 +56,101 @@ class BedrockAgent:
             5. Cost implications
             """
 
+_SUGGEST_POLICY_TEMPLATE = """
+            Please suggest an AWS IAM policy based on this description of required permissions:
+
+            Description: {description}
+
+            Provide your response as a valid IAM policy JSON document with minimal required permissions following the principle of least privilege.
+            Include comments explaining each permission.
+
+            Consider:
+            1. Use specific resource ARNs where possible
+            2. Avoid overly permissive actions (e.g., '*')
+            3. Include necessary conditions
+            4. Follow AWS security best practices
+            """
+
+class BedrockAgent:
+    def __init__(self):
+        self.model_id = get_settings().bedrock_model_id
+        # Shared client config: a pool large enough for concurrent tool
+        # calls, adaptive retries instead of the legacy mode, and keepalive
+        # so pooled connections survive between invocations
+        self._client_config = botocore.config.Config(
+            max_pool_connections=50,
+            retries={'max_attempts': 5, 'mode': 'adaptive'},
+            tcp_keepalive=True,
+            connect_timeout=5,
+            read_timeout=60
+        )
+        # Cache clients keyed by (service, access key, secret fingerprint,
+        # region) so repeated calls with the same credentials reuse the
+        # session and its TLS connections; keying on the full pair means a
+        # wrong secret can never be handed a previously authenticated client
+        self._client_cache: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # boto3 calls are synchronous; run them in a thread pool so they
+        # don't block the event loop while waiting on the network
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=16)
+        logger.info(f"Initialized BedrockAgent with model: {self.model_id}")
+
+    def _get_client(self, service: str, credentials: Optional[AWSCredentials] = None):
+        """Get a cached AWS service client for the given credentials"""
+        if not credentials:
+            raise Exception("AWS credentials are required for this operation")
+
+        cache_key = (service, credentials.accessKeyId, _credentials_fingerprint(credentials), credentials.region)
+        with self._cache_lock:
+            client = self._client_cache.get(cache_key)
+            if client is not None:
+                self._client_cache.move_to_end(cache_key)
+                return client
+
+        try:
+            session = boto3.Session(
+                aws_access_key_id=credentials.accessKeyId,
+                aws_secret_access_key=credentials.secretAccessKey,
+                region_name=credentials.region
+            )
+            client = session.client(service, config=self._client_config)
+            logger.info(f"AWS {service} client initialized successfully")
+        except Exception as e:
+            logger.error(f"Failed to initialize AWS session: {str(e)}")
+            raise Exception(f"Failed to initialize AWS session: {str(e)}")
+
+        with self._cache_lock:
+            self._client_cache[cache_key] = client
+            if len(self._client_cache) > _CLIENT_CACHE_MAX_SIZE:
+                self._client_cache.popitem(last=False)
+        return client
+
+    def _get_bedrock_client(self, credentials: Optional[AWSCredentials] = None):
+        """Get Bedrock client with appropriate credentials"""
+        return self._get_client('bedrock-runtime', credentials)
+
+    async def validate_aws_operation(
+        self, 
+        operation: Dict[str, Any],
+        credentials: Optional[AWSCredentials] = None
+    ) -> Dict[str, Any]:
+        """
+        Validates an AWS operation using Claude. This includes checking permissions
+        and validating that the operation is safe to execute.
+        """
+        try:
+            # Compact JSON is fine here; Bedrock doesn't need pretty-printing
+            prompt = _VALIDATE_OPERATION_TEMPLATE.format(
+                operation_json=orjson.dumps(operation).decode()
+            )
+
             response = await self._invoke_bedrock(prompt, credentials)
             try:
-                validation_result = json.loads(response)
+                validation_result = orjson.loads(response)
                 if not isinstance(validation_result, dict) or 'is_valid' not in validation_result:
                     raise Exception("Invalid validation response format")
                 return validation_result
-            except json.JSONDecodeError as e:
+            except orjson.JSONDecodeError as e:
                 logger.error(f"Failed to parse validation response: {str(e)}")
                 raise
 
@@ -114,6 +158,25 @@ class BedrockAgent:
             logger.error(f"Error in validate_aws_operation: {str(e)}")
             raise
 
+    async def validate_aws_operations_batch(
+        self,
+        operations: List[Dict[str, Any]],
+        credentials: Optional[AWSCredentials] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Validates several AWS operations concurrently. Each operation still
+        costs one Bedrock round-trip, but fanning them out under a semaphore
+        drops total latency from the sum of the round-trips to roughly the
+        slowest one.
+        """
+        semaphore = asyncio.Semaphore(8)
+
+        async def validate_one(operation: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.validate_aws_operation(operation, credentials)
+
+        return await asyncio.gather(*[validate_one(operation) for operation in operations])
+
     async def suggest_iam_policy(
         self, 
         description: str,
@@ -121,52 +184,74 @@ class BedrockAgent:
     ) -> Dict[str, Any]:
         """Suggests an IAM policy based on a description"""
         try:
-            prompt = f"""
-            Please suggest an AWS IAM policy based on this description of required permissions:
-
-            Description: {description}
-
-            Provide your response as a valid IAM policy JSON document with minimal required permissions following the principle of least privilege.
-            Include comments explaining each permission.
-
-            Consider:
-            1. Use specific resource ARNs where possible
-            2. Avoid overly permissive actions (e.g., '*')
-            3. Include necessary conditions
-            4. Follow AWS security best practices
-            """
+            prompt = _SUGGEST_POLICY_TEMPLATE.format(description=description)
 
             response = await self._invoke_bedrock(prompt, credentials)
             try:
-                policy = json.loads(response)
+                policy = orjson.loads(response)
                 return policy
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 return {"error": "Could not parse policy", "response": response}
 
         except Exception as e:
             logger.error(f"Error in suggest_iam_policy: {str(e)}")
             raise
 
+    def _invoke_model_streaming(self, bedrock, body: bytes) -> str:
+        """
+        Invokes the model with a response stream and drains it to a string.
+        Runs on the executor thread since iterating the event stream is
+        blocking I/O, but chunks are decoded incrementally as they arrive
+        instead of materializing and re-parsing the whole response body.
+        """
+        response = bedrock.invoke_model_with_response_stream(
+            modelId=self.model_id,
+            body=body
+        )
+        completion_parts = []
+        buffered = b''
+        for event in response['body']:
+            # Events normally carry one complete JSON document, but guard
+            # against fragmented chunks: probe the tail for a plausible
+            # document terminator before attempting a decode, so a long
+            # fragmented payload isn't re-parsed from scratch per fragment
+            buffered += event['chunk']['bytes']
+            tail = buffered.rstrip()
+            if not (tail.endswith(b'}') or tail.endswith(b']')):
+                continue
+            try:
+                chunk = orjson.loads(buffered)
+            except orjson.JSONDecodeError:
+                continue
+            buffered = b''
+            completion_parts.append(chunk.get('completion', ''))
+        if buffered.strip():
+            # Whatever is left must be a complete document; a decode error
+            # here is a genuinely malformed response and should propagate
+            chunk = orjson.loads(buffered)
+            completion_parts.append(chunk.get('completion', ''))
+        return ''.join(completion_parts)
+
     async def _invoke_bedrock(
-        self, 
+        self,
         prompt: str,
         credentials: Optional[AWSCredentials] = None
     ) -> str:
         """Invokes Bedrock with the given prompt"""
         try:
-            request = {
-                "prompt": f"\n\nHuman: {prompt}\n\nAssistant:",
-                "max_tokens_to_sample": 2048,
-                "temperature": 0,
-                "top_p": 0.9,
-            }
+            # Only the prompt varies per call; invoke_model accepts bytes
+            body = _BODY_PREFIX + orjson.dumps(f"\n\nHuman: {prompt}\n\nAssistant:") + _BODY_SUFFIX
 
             try:
                 bedrock = self._get_bedrock_client(credentials)
-                response = bedrock.invoke_model(
-                    modelId=self.model_id,
-                    body=json.dumps(request)
+                loop = asyncio.get_running_loop()
+                completion = await loop.run_in_executor(
+                    self._executor,
+                    functools.partial(self._invoke_model_streaming, bedrock, body)
                 )
+            except (orjson.JSONDecodeError, KeyError) as e:
+                logger.error(f"Failed to parse Bedrock response: {str(e)}")
+                raise Exception(f"Failed to parse Bedrock response: {str(e)}")
             except ClientError as e:
                 error_code = e.response['Error']['Code']
                 if error_code == 'AccessDeniedException':
@@ -185,16 +270,10 @@ class BedrockAgent:
                 logger.error(f"AWS Bedrock connection error: {str(e)}")
                 raise Exception(f"AWS Bedrock connection error: {str(e)}")
 
-            try:
-                response_body = json.loads(response['body'].read())
-                completion = response_body.get('completion', '')
-                if not completion:
-                    logger.error("Empty response from Bedrock")
-                    raise Exception("Empty response from Bedrock")
-                return completion
-            except (json.JSONDecodeError, KeyError) as e:
-                logger.error(f"Failed to parse Bedrock response: {str(e)}")
-                raise Exception(f"Failed to parse Bedrock response: {str(e)}")
+            if not completion:
+                logger.error("Empty response from Bedrock")
+                raise Exception("Empty response from Bedrock")
+            return completion
 
         except Exception as e:
             logger.error(f"Error in _invoke_bedrock: {str(e)}")
@@ -1,242 +1,309 @@
 from typing import List, Dict, Any, Optional
-from openai import OpenAI, APIError, BadRequestError, RateLimitError, AuthenticationError
+from openai import AsyncOpenAI, APIError, BadRequestError, RateLimitError, AuthenticationError
+from aiolimiter import AsyncLimiter
+import fastjsonschema
+import httpx
 from ..schemas.base import Message, ChatResponse, AWSCredentials
-from ..tools.aws_tools import AWSTools, AWSResponse
+from ..tools.aws_tools import AWSTools, AWSResponse, CREDENTIALS_CTX
 from .bedrock_agent import BedrockAgent
-from dotenv import load_dotenv
-import os
-import json
+from ..config import get_settings
+import asyncio
+import orjson
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Shared OpenAI client so every OrchestratorAgent reuses one connection
+# pool instead of building its own httpx client (and re-doing TLS handshakes)
+_openai_client = None
 
-class OrchestratorAgent:
-    def __init__(self):
-        # Load environment variables
-        api_key = os.environ.get("OPENAI_API_KEY")
+def get_openai_client() -> AsyncOpenAI:
+    global _openai_client
+    if _openai_client is None:
+        api_key = get_settings().openai_api_key
         if not api_key:
             logger.error("OpenAI API key not found in environment variables")
             raise Exception("OpenAI API key not found in environment variables")
-            
-        try:
-            self.client = OpenAI(api_key=api_key)
-            self.model = "gpt-4-1106-preview"  # Using the stable model name
-            self.aws_tools = AWSTools()
-            self.bedrock_agent = BedrockAgent()
-        except Exception as e:
-            logger.error(f"Error initializing OrchestratorAgent: {str(e)}")
-            raise
+        _openai_client = AsyncOpenAI(
+            api_key=api_key,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+                timeout=60.0
+            )
+        )
+    return _openai_client
 
-        # Define tools that require AWS credentials
-        self.aws_operations = {
-            'get_s3_bucket_sizes': True,
-            'list_ec2_instances': True,
-            'describe_iam_role': True,
-            'create_s3_bucket': True,
-            'create_lambda_function': True,
-            'create_iam_role': True,
-            'assign_policy_to_role': True,
-            'get_s3_bucket_file_count': True  # Add new operation
-        }
+# Proactive OpenAI throttling: a token bucket sized to the account's RPM
+# tier plus a concurrency cap, so bursts queue locally instead of burning
+# requests that come back as 429s. Lazily built so the limiter binds to
+# the running event loop.
+_openai_limiter = None
+_openai_semaphore = None
 
-        self.tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_s3_bucket_file_count",
-                    "description": "Returns the number of files in an S3 bucket or all buckets",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "bucket_name": {
-                                "type": "string",
-                                "description": "Optional. Name of the specific S3 bucket to check. If not provided, checks all buckets."
-                            }
-                        }
+def _get_openai_throttle():
+    global _openai_limiter, _openai_semaphore
+    if _openai_limiter is None:
+        settings = get_settings()
+        _openai_limiter = AsyncLimiter(max_rate=settings.openai_rpm_limit, time_period=60)
+        _openai_semaphore = asyncio.Semaphore(settings.openai_max_concurrency)
+    return _openai_limiter, _openai_semaphore
+
+async def _throttled_completion(client: AsyncOpenAI, **kwargs):
+    """Issue a chat completion through the shared rate limiter"""
+    limiter, semaphore = _get_openai_throttle()
+    async with semaphore:
+        async with limiter:
+            return await client.chat.completions.create(**kwargs)
+
+# Operations that require AWS credentials before they can run
+_AWS_OPERATIONS = frozenset({
+    'get_s3_bucket_sizes',
+    'list_ec2_instances',
+    'describe_iam_role',
+    'create_s3_bucket',
+    'create_lambda_function',
+    'create_iam_role',
+    'assign_policy_to_role',
+    'get_s3_bucket_file_count',
+})
+
+# Subset of _AWS_OPERATIONS that changes AWS state. Responses describing
+# these must never be replayed from a cache: a cached "successfully
+# created" message would claim the operation happened without running it.
+MUTATING_AWS_OPERATIONS = frozenset({
+    'create_s3_bucket',
+    'create_lambda_function',
+    'create_iam_role',
+    'assign_policy_to_role',
+})
+
+# Static tool specification shipped to OpenAI with every request.
+# Built once at import time instead of on every OrchestratorAgent construction.
+_TOOLS_SCHEMA = (
+    {
+        "type": "function",
+        "function": {
+            "name": "get_s3_bucket_file_count",
+            "description": "Returns the number of files in an S3 bucket or all buckets",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "bucket_name": {
+                        "type": "string",
+                        "description": "Optional. Name of the specific S3 bucket to check. If not provided, checks all buckets."
                     }
                 }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_s3_bucket_sizes",
-                    "description": "Returns total size of all accessible S3 buckets",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {}
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_s3_bucket_sizes",
+            "description": "Returns total size of all accessible S3 buckets",
+            "parameters": {
+                "type": "object",
+                "properties": {}
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "list_ec2_instances",
+            "description": "Returns list of EC2 instances with their details",
+            "parameters": {
+                "type": "object",
+                "properties": {}
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "describe_iam_role",
+            "description": "Returns details about an IAM role",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "role_name": {
+                        "type": "string",
+                        "description": "Name of the IAM role"
                     }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "list_ec2_instances",
-                    "description": "Returns list of EC2 instances with their details",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {}
+                },
+                "required": ["role_name"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "suggest_iam_policy",
+            "description": "Suggests an IAM policy based on a description of required permissions",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "description": {
+                        "type": "string",
+                        "description": "Description of the required permissions"
                     }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "describe_iam_role",
-                    "description": "Returns details about an IAM role",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "role_name": {
-                                "type": "string",
-                                "description": "Name of the IAM role"
-                            }
-                        },
-                        "required": ["role_name"]
+                },
+                "required": ["description"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "create_s3_bucket",
+            "description": "Creates a new S3 bucket",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "bucket_name": {
+                        "type": "string",
+                        "description": "Name of the S3 bucket to create"
                     }
-                }
+                },
+                "required": ["bucket_name"]
             }
-        ]
-
-        # Add new tool for IAM policy suggestion
-        self.tools.append({
-            "type": "function",
-            "function": {
-                "name": "suggest_iam_policy",
-                "description": "Suggests an IAM policy based on a description of required permissions",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "description": {
-                            "type": "string",
-                            "description": "Description of the required permissions"
-                        }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "create_lambda_function",
+            "description": "Creates a new Lambda function",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "name": {
+                        "type": "string",
+                        "description": "Name of the Lambda function"
                     },
-                    "required": ["description"]
-                }
-            }
-        })
-
-        # Add AWS resource creation tools
-        self.tools.extend([
-            {
-                "type": "function",
-                "function": {
-                    "name": "create_s3_bucket",
-                    "description": "Creates a new S3 bucket",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "bucket_name": {
-                                "type": "string",
-                                "description": "Name of the S3 bucket to create"
-                            }
-                        },
-                        "required": ["bucket_name"]
-                    }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "create_lambda_function",
-                    "description": "Creates a new Lambda function",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "name": {
-                                "type": "string",
-                                "description": "Name of the Lambda function"
-                            },
-                            "role_arn": {
-                                "type": "string",
-                                "description": "ARN of the IAM role for the function"
-                            },
-                            "runtime": {
-                                "type": "string",
-                                "description": "Runtime environment (e.g., python3.9)"
-                            },
-                            "handler": {
-                                "type": "string",
-                                "description": "Function handler (e.g., index.handler)"
-                            },
-                            "zip_file_path": {
-                                "type": "string",
-                                "description": "Path to the zip file containing function code"
-                            }
-                        },
-                        "required": ["name", "role_arn", "runtime", "handler", "zip_file_path"]
+                    "role_arn": {
+                        "type": "string",
+                        "description": "ARN of the IAM role for the function"
+                    },
+                    "runtime": {
+                        "type": "string",
+                        "description": "Runtime environment (e.g., python3.9)"
+                    },
+                    "handler": {
+                        "type": "string",
+                        "description": "Function handler (e.g., index.handler)"
+                    },
+                    "zip_file_path": {
+                        "type": "string",
+                        "description": "Path to the zip file containing function code"
                     }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "create_iam_role",
-                    "description": "Creates a new IAM role",
-                    "parameters": {
+                },
+                "required": ["name", "role_arn", "runtime", "handler", "zip_file_path"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "create_iam_role",
+            "description": "Creates a new IAM role",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "name": {
+                        "type": "string",
+                        "description": "Name of the IAM role"
+                    },
+                    "policy_document": {
                         "type": "object",
-                        "properties": {
-                            "name": {
-                                "type": "string",
-                                "description": "Name of the IAM role"
-                            },
-                            "policy_document": {
-                                "type": "object",
-                                "description": "IAM policy document"
-                            }
-                        },
-                        "required": ["name", "policy_document"]
+                        "description": "IAM policy document"
                     }
-                }
-            },
-            {
-                "type": "function",
-                "function": {
-                    "name": "assign_policy_to_role",
-                    "description": "Attaches an existing policy to an IAM role",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "role_name": {
-                                "type": "string",
-                                "description": "Name of the IAM role"
-                            },
-                            "policy_arn": {
-                                "type": "string",
-                                "description": "ARN of the policy to attach"
-                            }
-                        },
-                        "required": ["role_name", "policy_arn"]
+                },
+                "required": ["name", "policy_document"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "assign_policy_to_role",
+            "description": "Attaches an existing policy to an IAM role",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "role_name": {
+                        "type": "string",
+                        "description": "Name of the IAM role"
+                    },
+                    "policy_arn": {
+                        "type": "string",
+                        "description": "ARN of the policy to attach"
                     }
-                }
+                },
+                "required": ["role_name", "policy_arn"]
             }
-        ])
+        }
+    },
+)
+
+class OrchestratorAgent:
+    def __init__(self):
+        try:
+            self.client = get_openai_client()
+            self.model = "gpt-4-1106-preview"  # Using the stable model name
+            self.aws_tools = AWSTools()
+            self.bedrock_agent = BedrockAgent()
+        except Exception as e:
+            logger.error(f"Error initializing OrchestratorAgent: {str(e)}")
+            raise
+
+        self.aws_operations = _AWS_OPERATIONS
+        self.tools = _TOOLS_SCHEMA
+
+        # Allowlisted dispatch table built once, so tool execution is a dict
+        # probe instead of hasattr/getattr per call. Also prevents a tool
+        # name from reaching arbitrary attributes on AWSTools.
+        self._fn_table = {
+            name: getattr(self.aws_tools, name)
+            for name in _AWS_OPERATIONS
+            if hasattr(self.aws_tools, name)
+        }
+        self._fn_table['suggest_iam_policy'] = self.bedrock_agent.suggest_iam_policy
+
+        # Validators precompiled from the tool schemas, so malformed tool
+        # arguments are rejected locally instead of after an AWS round-trip
+        self._validators = {
+            tool["function"]["name"]: fastjsonschema.compile(tool["function"]["parameters"])
+            for tool in _TOOLS_SCHEMA
+        }
 
     def _requires_aws_credentials(self, function_name: str) -> bool:
-        return self.aws_operations.get(function_name, False)
+        return function_name in _AWS_OPERATIONS
 
     async def process_request(self, messages: List[Message], aws_credentials: Optional[AWSCredentials] = None) -> ChatResponse:
+        # Make the credentials visible to the AWS tools for this request
+        # without threading them through every tool's kwargs
+        credentials_token = CREDENTIALS_CTX.set(aws_credentials)
         try:
             logger.info("Processing request with %d messages", len(messages))
             # Convert messages to OpenAI format
             openai_messages = [{"role": msg.role, "content": msg.content} for msg in messages]
-            logger.debug("OpenAI messages: %s", json.dumps(openai_messages))
+            # Only pay for serialization when debug logging is actually on
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("OpenAI messages: %s", orjson.dumps(openai_messages).decode())
             
             try:
                 logger.info("Calling OpenAI API with model: %s", self.model)
                 # Get response from OpenAI with function calling
-                response = self.client.chat.completions.create(
+                response = await _throttled_completion(
+                    self.client,
                     model=self.model,
                     messages=openai_messages,
                     tools=self.tools,
                     tool_choice="auto"
                 )
-                logger.debug("OpenAI response: %s", json.dumps(response.model_dump()))
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("OpenAI response: %s", orjson.dumps(response.model_dump()).decode())
             except AuthenticationError as e:
                 logger.error("OpenAI authentication failed: %s", str(e))
                 raise
@@ -258,83 +325,120 @@ class OrchestratorAgent:
             aws_resources_affected = []
             
             if message.tool_calls:
+                # First pass: parse arguments and check credential requirements
+                # before dispatching anything
+                pending = []
                 for tool_call in message.tool_calls:
-                    try:
-                        function_name = tool_call.function.name
-                        arguments = json.loads(tool_call.function.arguments)
-                        logger.info("Processing tool call: %s with arguments: %s", function_name, arguments)
-                        
-                        # Check if operation requires AWS credentials
-                        if self._requires_aws_credentials(function_name):
-                            if not aws_credentials:
-                                return ChatResponse(
-                                    response="I'll need your AWS credentials to perform this operation. Don't worry - your credentials will be used securely and only for this specific task. Please provide them in the prompt.",
-                                    requiresCredentials=True
-                                )
-
-                            # Add credentials to the arguments
-                            arguments['credentials'] = aws_credentials
+                    function_name = tool_call.function.name
+                    arguments = orjson.loads(tool_call.function.arguments)
+                    logger.info("Processing tool call: %s with arguments: %s", function_name, arguments)
 
-                        # Execute the function
+                    # Validate arguments against the tool schema before dispatching
+                    validate_arguments = self._validators.get(function_name)
+                    if validate_arguments:
                         try:
-                            result = await self._execute_function(function_name, arguments)
-                            
-                            # Handle AWSResponse type
-                            if isinstance(result, AWSResponse):
-                                if result.requires_credentials:
-                                    return ChatResponse(
-                                        response=result.message,
-                                        requiresCredentials=True
-                                    )
-                                elif not result.success:
-                                    return ChatResponse(
-                                        response=result.message,
-                                        actions_taken=actions_taken
-                                    )
-                                else:
-                                    actions_taken.append(f"Successfully executed {function_name}")
-                                    result = result.data  # Use the data for OpenAI response
+                            validate_arguments(arguments)
+                        except fastjsonschema.JsonSchemaException as e:
+                            logger.error("Invalid arguments for %s: %s", function_name, e.message)
+                            raise Exception(f"Invalid arguments for {function_name}: {e.message}")
+
+                    # Check if operation requires AWS credentials; the tools
+                    # themselves read them from CREDENTIALS_CTX
+                    if self._requires_aws_credentials(function_name) and not aws_credentials:
+                        return ChatResponse.model_construct(
+                            response="I'll need your AWS credentials to perform this operation. Don't worry - your credentials will be used securely and only for this specific task. Please provide them in the prompt.",
+                            requiresCredentials=True
+                        )
 
-                            # Record AWS resource changes
-                            if function_name in self.aws_operations:
-                                aws_resources_affected.append({
-                                    'operation': function_name,
-                                    'parameters': {k: v for k, v in arguments.items() if k != 'credentials'}
-                                })
+                    pending.append((tool_call, function_name, arguments))
 
-                            # Add results to conversation
-                            openai_messages.append({
-                                "role": "assistant",
-                                "content": None,
-                                "tool_call_id": tool_call.id,
-                                "name": function_name,
-                                "tool_calls": [tool_call]
-                            })
-                            openai_messages.append({
-                                "role": "tool",
-                                "content": json.dumps(result),
-                                "tool_call_id": tool_call.id
-                            })
+                # Second pass: the tool calls are independent AWS operations,
+                # so execute them concurrently with a cap on parallelism
+                semaphore = asyncio.Semaphore(8)
 
-                        except Exception as e:
-                            error_msg = str(e)
-                            if "credentials" in error_msg.lower() or "access" in error_msg.lower():
-                                return ChatResponse(
-                                    response=f"I need valid AWS credentials to perform this operation: {error_msg}",
-                                    requiresCredentials=True
-                                )
-                            raise
-                    except Exception as e:
-                        logger.error("Error processing tool call: %s", str(e))
-                        raise
+                async def run_tool_call(function_name: str, arguments: Dict[str, Any]):
+                    async with semaphore:
+                        return await self._execute_function(function_name, arguments)
+
+                results = await asyncio.gather(
+                    *[run_tool_call(function_name, arguments) for _, function_name, arguments in pending],
+                    return_exceptions=True
+                )
+
+                # Record results in the original tool_calls order so the
+                # follow-up OpenAI call sees a deterministic conversation.
+                # Collect the new messages locally and extend once at the end
+                # instead of growing openai_messages inside the loop.
+                tool_outputs = []
+                for (tool_call, function_name, arguments), result in zip(pending, results):
+                    if isinstance(result, Exception):
+                        error_msg = str(result)
+                        if "credentials" in error_msg.lower() or "access" in error_msg.lower():
+                            return ChatResponse.model_construct(
+                                response=f"I need valid AWS credentials to perform this operation: {error_msg}",
+                                requiresCredentials=True
+                            )
+                        logger.error("Error processing tool call: %s", error_msg)
+                        raise result
+
+                    # Handle AWSResponse type
+                    if isinstance(result, AWSResponse):
+                        if result.requires_credentials:
+                            return ChatResponse.model_construct(
+                                response=result.message,
+                                requiresCredentials=True
+                            )
+                        elif not result.success:
+                            # Mark the failure so the handler never caches
+                            # a transient error as the answer
+                            return ChatResponse.model_construct(
+                                response=result.message,
+                                actions_taken=actions_taken,
+                                error=result.message
+                            )
+                        else:
+                            actions_taken.append(f"Successfully executed {function_name}")
+                            result = result.data  # Use the data for OpenAI response
+
+                    # Record AWS resource changes
+                    if function_name in self.aws_operations:
+                        aws_resources_affected.append({
+                            'operation': function_name,
+                            'parameters': arguments
+                        })
+
+                    # Add results to conversation
+                    tool_outputs.append({
+                        "role": "assistant",
+                        "content": None,
+                        "tool_call_id": tool_call.id,
+                        "name": function_name,
+                        "tool_calls": [tool_call]
+                    })
+                    tool_outputs.append({
+                        "role": "tool",
+                        "content": orjson.dumps(result).decode(),
+                        "tool_call_id": tool_call.id
+                    })
+
+                openai_messages.extend(tool_outputs)
                 
                 try:
-                    # Get final response after function execution
-                    final_response = self.client.chat.completions.create(
+                    # Stream the final response after function execution so we
+                    # consume tokens as they are generated instead of waiting
+                    # for the whole completion object
+                    final_stream = await _throttled_completion(
+                        self.client,
                         model=self.model,
-                        messages=openai_messages
+                        messages=openai_messages,
+                        stream=True
                     )
-                    content = final_response.choices[0].message.content
+                    content_parts = []
+                    async for chunk in final_stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            content_parts.append(delta)
+                    content = "".join(content_parts)
                     logger.info("Final response received from OpenAI")
                 except Exception as e:
                     logger.error("Error getting final response from OpenAI: %s", str(e))
@@ -342,7 +446,7 @@ class OrchestratorAgent:
             else:
                 content = message.content
             
-            return ChatResponse(
+            return ChatResponse.model_construct(
                 response=content,
                 actions_taken=actions_taken,
                 aws_resources_affected=aws_resources_affected,
@@ -352,6 +456,8 @@ class OrchestratorAgent:
         except Exception as e:
             logger.error("Error in process_request: %s", str(e))
             raise Exception(f"Error in process_request: {str(e)}")
+        finally:
+            CREDENTIALS_CTX.reset(credentials_token)
 
     async def validate_aws_operation(self, operation: Dict[str, Any], credentials: Optional[AWSCredentials] = None) -> bool:
         try:
@@ -364,12 +470,21 @@ class OrchestratorAgent:
             logger.error("Error validating AWS operation: %s", str(e))
             raise Exception(f"Error validating AWS operation: {str(e)}")
 
+    async def validate_aws_operations_batch(self, operations: List[Dict[str, Any]], credentials: Optional[AWSCredentials] = None) -> List[bool]:
+        try:
+            logger.info("Validating %d AWS operations", len(operations))
+            validation_results = await self.bedrock_agent.validate_aws_operations_batch(operations, credentials)
+            return [result.get('is_valid', False) for result in validation_results]
+        except Exception as e:
+            logger.error("Error validating AWS operations: %s", str(e))
+            raise Exception(f"Error validating AWS operations: {str(e)}")
+
     async def _execute_function(self, function_name: str, arguments: Dict[str, Any] = None) -> Any:
-        if not hasattr(self.aws_tools, function_name):
+        function = self._fn_table.get(function_name)
+        if function is None:
             logger.error("Unknown function: %s", function_name)
             raise Exception(f"Unknown function: {function_name}")
-            
-        function = getattr(self.aws_tools, function_name)
+
         logger.info("Executing function: %s with arguments: %s", function_name, arguments)
         if arguments:
             return await function(**arguments)
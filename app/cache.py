@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import diskcache
+import msgspec
+
+from .schemas.base import AWSCredentials
+
+logger = logging.getLogger(__name__)
+
+# How long a cached chat response stays servable. AWS listings go stale, so
+# keep this short; a hit still saves a full LLM round-trip.
+_DEFAULT_TTL_SECONDS = 300
+
+def _dot(a: List[float], b: List[float]) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+def credentials_namespace(credentials: Optional[AWSCredentials]) -> str:
+    """
+    Cache namespace derived from the full credential pair. Access key IDs
+    are identifiers, not secrets, so the secret must participate in the
+    namespace — otherwise anyone who knows a tenant's key ID could be
+    served their cached data without ever authenticating.
+    """
+    if not credentials:
+        return "anonymous"
+    return hashlib.blake2b(
+        credentials.accessKeyId.encode() + b":" + credentials.secretAccessKey.encode(),
+        digest_size=16
+    ).hexdigest()
+
+class ExactResponseCache:
+    """
+    Persistent exact-match cache for chat responses, keyed by a digest of
+    the tenant namespace and the full message history. Exact repeats (UI
+    reruns, "what's my EC2 again?") skip the LLM entirely; near-repeats
+    still go through the SemanticCache. diskcache reads are memory-mapped,
+    so a lookup is negligible next to an OpenAI round-trip, and entries
+    survive worker restarts.
+    """
+
+    def __init__(self, directory: Optional[str] = None, ttl_seconds: float = _DEFAULT_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._cache = diskcache.Cache(
+            directory or os.path.join(tempfile.gettempdir(), "cloudpilot-chat-cache")
+        )
+
+    @staticmethod
+    def key(namespace: str, messages: List[Any]) -> bytes:
+        """Digest of the namespace plus every (role, content) pair in order"""
+        encoded = msgspec.json.encode([[msg.role, msg.content] for msg in messages])
+        return hashlib.sha256(namespace.encode() + encoded).digest()
+
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        payload = self._cache.get(key)
+        if payload is not None:
+            logger.info("Exact-match cache hit")
+        return payload
+
+    def put(self, key: bytes, payload: Dict[str, Any]) -> None:
+        self._cache.set(key, payload, expire=self.ttl_seconds)
+
+class SemanticCache:
+    """
+    In-memory semantic cache for chat responses. Entries are stored per
+    namespace (credential fingerprint) so one tenant can never be served
+    another tenant's cached answer. OpenAI embeddings are unit-length, so
+    cosine similarity reduces to a dot product.
+    """
+
+    def __init__(self, threshold: float = 0.85, ttl_seconds: float = _DEFAULT_TTL_SECONDS, max_entries: int = 256):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[str, List[Tuple[float, List[float], Dict[str, Any]]]] = {}
+
+    def get(self, namespace: str, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        entries = self._entries.get(namespace)
+        if not entries:
+            return None
+
+        # Drop expired entries in place before searching
+        now = time.monotonic()
+        entries[:] = [entry for entry in entries if now - entry[0] < self.ttl_seconds]
+
+        best_score = 0.0
+        best_payload = None
+        for _, cached_embedding, payload in entries:
+            score = _dot(embedding, cached_embedding)
+            if score > best_score:
+                best_score = score
+                best_payload = payload
+
+        if best_payload is not None and best_score >= self.threshold:
+            logger.info("Semantic cache hit (similarity %.3f)", best_score)
+            return best_payload
+        return None
+
+    def put(self, namespace: str, embedding: List[float], payload: Dict[str, Any]) -> None:
+        entries = self._entries.setdefault(namespace, [])
+        entries.append((time.monotonic(), embedding, payload))
+        if len(entries) > self.max_entries:
+            del entries[0]
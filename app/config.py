@@ -0,0 +1,22 @@
+from dataclasses import dataclass
+from dotenv import load_dotenv
+import functools
+import os
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    openai_api_key: str
+    bedrock_model_id: str
+    openai_rpm_limit: int
+    openai_max_concurrency: int
+
+@functools.lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Load environment configuration once and cache it for the process"""
+    load_dotenv()
+    return Settings(
+        openai_api_key=os.environ.get("OPENAI_API_KEY", ""),
+        bedrock_model_id=os.environ.get("AWS_BEDROCK_MODEL_ID", "anthropic.claude-v2"),
+        openai_rpm_limit=int(os.environ.get("OPENAI_RPM_LIMIT", "500")),
+        openai_max_concurrency=int(os.environ.get("OPENAI_MAX_CONCURRENCY", "32")),
+    )
@@ -1,16 +1,22 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request
+import msgspec
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from openai import APIError, BadRequestError, RateLimitError, AuthenticationError
-from dotenv import load_dotenv
-import boto3
+from botocore.exceptions import BotoCoreError, ClientError
+import asyncio
+import logging
 import traceback
 import os
 
-# Load environment variables before importing other modules
-load_dotenv()
+from .config import get_settings
+
+# Configure logging once for the whole app; modules use getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Load environment variables (cached settings) before importing other modules
+get_settings()
 
 # Verify required environment variables
 required_env_vars = [
@@ -26,21 +32,24 @@ if missing_vars:
     raise Exception(f"Missing required environment variables: {', '.join(missing_vars)}")
 
 from .schemas.base import (
-    ChatRequest, 
-    ChatResponse, 
-    IAMPolicyRequest, 
+    ChatResponse,
+    IAMPolicyRequest,
     IAMPolicyResponse,
     Message,
-    MessageRole,
-    AWSCredentials
+    MessageRole
 )
-from .agents.orchestrator import OrchestratorAgent
+from .agents.orchestrator import OrchestratorAgent, get_openai_client, MUTATING_AWS_OPERATIONS
 from .agents.bedrock_agent import BedrockAgent
+from .cache import ExactResponseCache, SemanticCache, credentials_namespace
+from .schemas.wire import decode_chat_request
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="CloudPilot API",
     description="Multi-Agent AWS Assistant API",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware with development configuration
@@ -56,26 +65,50 @@ app.add_middleware(
 orchestrator = OrchestratorAgent()
 bedrock_agent = BedrockAgent()
 
+# Chat traffic is highly repetitive ("list my buckets", "show my EC2
+# instances"), so serve recent similar answers from a semantic cache
+# before paying a full orchestrator + LLM round-trip
+semantic_cache = SemanticCache()
+
+# Exact repeats of a conversation short-circuit before even the embedding
+# call the semantic cache needs
+exact_cache = ExactResponseCache()
+
+# Identical prompts that arrive while an equivalent request is still in
+# flight share its orchestrator call instead of each paying for their own
+# OpenAI round-trip (single-flight coalescing, keyed per tenant)
+_inflight_requests: dict = {}
+
+# Injected when the conversation carries no system message; built once
+# since the content never varies per request
+_DEFAULT_SYSTEM_MSG = Message.model_construct(
+    role=MessageRole.SYSTEM,
+    content="You are CloudPilot, an AI assistant specialized in AWS cloud operations. "
+            "You can help with AWS infrastructure management, security best practices, "
+            "and resource optimization."
+)
+
+# Shared by the exception handlers; building the dict per error response
+# is pure allocation churn (Starlette copies the headers it is given)
+_CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "http://localhost:5173",
+    "Access-Control-Allow-Credentials": "true",
+}
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
-        content=jsonable_encoder({"detail": exc.detail}),
-        headers={
-            "Access-Control-Allow-Origin": "http://localhost:5173",
-            "Access-Control-Allow-Credentials": "true",
-        },
+        content={"detail": exc.detail},
+        headers=_CORS_HEADERS,
     )
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=422,
-        content=jsonable_encoder({"detail": str(exc)}),
-        headers={
-            "Access-Control-Allow-Origin": "http://localhost:5173",
-            "Access-Control-Allow-Credentials": "true",
-        },
+        content={"detail": str(exc)},
+        headers=_CORS_HEADERS,
     )
 
 @app.get("/")
@@ -86,26 +119,102 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+# No response_model: the handlers build trusted ChatResponse objects
+# in-process and serialize them directly, so FastAPI's outgoing
+# re-validation pass would be pure overhead
+@app.post("/chat")
+async def chat(raw_request: Request) -> ORJSONResponse:
+    # Decode the body with msgspec instead of FastAPI's Pydantic parsing;
+    # it's markedly faster on long message histories
     try:
-        # Add system message if not present
-        if not any(msg.role == MessageRole.SYSTEM for msg in request.messages):
-            system_message = Message(
-                role=MessageRole.SYSTEM,
-                content="You are CloudPilot, an AI assistant specialized in AWS cloud operations. "
-                       "You can help with AWS infrastructure management, security best practices, "
-                       "and resource optimization."
-            )
-            request.messages.insert(0, system_message)
+        request = decode_chat_request(await raw_request.body())
+    except msgspec.DecodeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    try:
+        # Add system message if not present; when one exists it is
+        # virtually always first, so check position 0 instead of scanning
+        if not request.messages or request.messages[0].role is not MessageRole.SYSTEM:
+            request.messages.insert(0, _DEFAULT_SYSTEM_MSG)
+
+        # Look up the caches; the namespace covers the full credential
+        # pair so tenants never share hits and a known access key ID
+        # alone cannot read another tenant's entries
+        namespace = credentials_namespace(request.awsCredentials)
+        exact_key = ExactResponseCache.key(namespace, request.messages)
+        try:
+            cached = exact_cache.get(exact_key)
+            if cached is not None:
+                return ORJSONResponse(cached)
+        except Exception:
+            logger.warning("Exact-match cache lookup failed", exc_info=True)
+
+        query = request.messages[-1].content if request.messages else ""
+        query_embedding = None
+        if query:
+            try:
+                embedding_response = await get_openai_client().embeddings.create(
+                    model="text-embedding-3-small",
+                    input=query
+                )
+                query_embedding = embedding_response.data[0].embedding
+                cached = semantic_cache.get(namespace, query_embedding)
+                if cached is not None:
+                    return ORJSONResponse(cached)
+            except Exception:
+                # The cache is best-effort; fall through to the orchestrator
+                logger.warning("Semantic cache lookup failed", exc_info=True)
 
         try:
-            # Pass AWS credentials to the orchestrator if provided
-            response = await orchestrator.process_request(
-                request.messages,
-                aws_credentials=request.awsCredentials
+            # Coalesce identical concurrent conversations onto one
+            # orchestrator call. The exact-cache digest already identifies
+            # the conversation. The flight runs as a detached task and
+            # every waiter (the creator included) awaits it through a
+            # shield, so cancelling one request never cancels the shared
+            # flight out from under the others; the done callback retires
+            # the entry whatever way the flight ends.
+            flight_key = exact_key
+            flight = _inflight_requests.get(flight_key)
+            if flight is None:
+                flight = asyncio.ensure_future(orchestrator.process_request(
+                    request.messages,
+                    aws_credentials=request.awsCredentials
+                ))
+                _inflight_requests[flight_key] = flight
+                flight.add_done_callback(
+                    lambda _, key=flight_key: _inflight_requests.pop(key, None)
+                )
+            response = await asyncio.shield(flight)
+            # Serialize with orjson directly instead of the jsonable_encoder walk
+            payload = response.model_dump()
+            # Never cache responses describing state changes (a hit would
+            # replay the success message without performing the operation)
+            # or failures (a throttle or 5xx would become the answer for
+            # the rest of the TTL)
+            cacheable = (
+                not response.requiresCredentials
+                and response.error is None
+                and not any(
+                    resource['operation'] in MUTATING_AWS_OPERATIONS
+                    for resource in response.aws_resources_affected
+                )
             )
-            return response
+            if cacheable:
+                try:
+                    exact_cache.put(exact_key, payload)
+                except Exception:
+                    logger.warning("Exact-match cache store failed", exc_info=True)
+                # Parameterized reads are too close in embedding space to
+                # their siblings ("describe role X" vs "describe role Y")
+                # for similarity matching to be safe, so those are served
+                # only by the exact-match cache
+                parameterized = any(
+                    resource['parameters']
+                    for resource in response.aws_resources_affected
+                )
+                if query_embedding is not None and not parameterized:
+                    semantic_cache.put(namespace, query_embedding, payload)
+            return ORJSONResponse(payload)
         except AuthenticationError:
             raise HTTPException(
                 status_code=401,
@@ -126,23 +235,23 @@ async def chat(request: ChatRequest):
                 status_code=500,
                 detail=f"OpenAI API error: {str(e)}"
             )
-        except boto3.exceptions.BotoCoreError as e:
+        except BotoCoreError as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"AWS API error: {str(e)}"
             )
-        except boto3.exceptions.ClientError as e:
+        except ClientError as e:
             error_code = e.response['Error']['Code']
             if error_code == 'InvalidClientTokenId':
-                return ChatResponse(
+                return ORJSONResponse(ChatResponse.model_construct(
                     response="Your AWS credentials appear to be invalid. Please provide valid credentials.",
                     requiresCredentials=True
-                )
+                ).model_dump())
             elif error_code == 'AccessDenied':
-                return ChatResponse(
+                return ORJSONResponse(ChatResponse.model_construct(
                     response="Your AWS credentials don't have sufficient permissions for this operation.",
                     requiresCredentials=True
-                )
+                ).model_dump())
             else:
                 raise HTTPException(
                     status_code=500,
@@ -164,8 +273,8 @@ async def chat(request: ChatRequest):
             detail=f"An unexpected error occurred: {str(e)}"
         )
 
-@app.post("/suggest-iam-policy", response_model=IAMPolicyResponse)
-async def suggest_iam_policy(request: IAMPolicyRequest):
+@app.post("/suggest-iam-policy")
+async def suggest_iam_policy(request: IAMPolicyRequest) -> ORJSONResponse:
     try:
         policy_suggestion = await bedrock_agent.suggest_iam_policy(
             request.description,
@@ -173,11 +282,11 @@ async def suggest_iam_policy(request: IAMPolicyRequest):
         )
         if isinstance(policy_suggestion, dict) and "error" in policy_suggestion:
             raise HTTPException(status_code=400, detail=policy_suggestion["response"])
-        return IAMPolicyResponse(
+        return ORJSONResponse(IAMPolicyResponse.model_construct(
             policy_document=policy_suggestion,
             explanation="Policy generated based on provided description",
             warnings=[]  # Add any warnings from validation here
-        )
+        ).model_dump())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,47 @@
+import msgspec
+from typing import Any, Dict, List, Optional
+
+from .base import AWSCredentials, ChatRequest, Message, MessageRole
+
+# msgspec mirrors of the /chat request schema. msgspec decodes and validates
+# schematic JSON several times faster than running the body through Pydantic,
+# which matters for long message histories on the hot endpoint. The decoded
+# structs are lifted into the existing Pydantic models with model_construct,
+# so downstream code keeps its usual types without a second validation pass.
+
+class WireMessage(msgspec.Struct):
+    role: MessageRole
+    content: str
+
+class WireAWSCredentials(msgspec.Struct):
+    accessKeyId: str
+    secretAccessKey: str
+    region: str = "ap-south-1"
+
+class WireChatRequest(msgspec.Struct):
+    messages: List[WireMessage]
+    user_id: Optional[str] = None
+    aws_context: Optional[Dict[str, Any]] = None
+    awsCredentials: Optional[WireAWSCredentials] = None
+
+_chat_request_decoder = msgspec.json.Decoder(WireChatRequest)
+
+def decode_chat_request(body: bytes) -> ChatRequest:
+    """Decode and validate a raw /chat body into a ChatRequest"""
+    wire = _chat_request_decoder.decode(body)
+    aws_credentials = None
+    if wire.awsCredentials is not None:
+        aws_credentials = AWSCredentials.model_construct(
+            accessKeyId=wire.awsCredentials.accessKeyId,
+            secretAccessKey=wire.awsCredentials.secretAccessKey,
+            region=wire.awsCredentials.region,
+        )
+    return ChatRequest.model_construct(
+        messages=[
+            Message.model_construct(role=message.role, content=message.content)
+            for message in wire.messages
+        ],
+        user_id=wire.user_id,
+        aws_context=wire.aws_context,
+        awsCredentials=aws_credentials,
+    )
@@ -1,18 +1,53 @@
-import boto3
-import os
-import json
+import aioboto3
+import asyncio
+import contextvars
+import hashlib
+from collections import OrderedDict
+from operator import itemgetter
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Any, Optional, Union
-from dotenv import load_dotenv
+import numpy as np
 from ..schemas.base import AWSCredentials
 import logging
+import botocore.config
 from botocore.exceptions import ClientError, BotoCoreError
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Credentials for the request currently being processed. The orchestrator
+# sets this once per request so tool arguments stay purely JSON-serializable
+# instead of carrying a Pydantic model through every kwargs dict.
+CREDENTIALS_CTX: contextvars.ContextVar[Optional[AWSCredentials]] = contextvars.ContextVar(
+    "aws_credentials", default=None
+)
+
+# C-level Size accessor for the hot list_objects_v2 page loops; map() with
+# an itemgetter skips the per-object bytecode a generator expression runs
+_GET_SIZE = itemgetter('Size')
+
+def _sum_sizes(contents: List[Dict[str, Any]]) -> int:
+    """Sum of the Size fields of a list_objects_v2 page as a C-level reduction"""
+    sizes = np.fromiter(map(_GET_SIZE, contents), dtype=np.int64, count=len(contents))
+    return int(sizes.sum())
+
+# Maximum number of cached AWS clients before evicting the least recently used
+_CLIENT_CACHE_MAX_SIZE = 128
+
+# Shared client config: the connection pool must be at least as wide as the
+# listing semaphores (16) or the parallel prefix fan-out serializes on the
+# default 10-connection pool; adaptive retries and keepalive match the
+# Bedrock client tuning
+_CLIENT_CONFIG = botocore.config.Config(
+    max_pool_connections=50,
+    retries={'max_attempts': 5, 'mode': 'adaptive'},
+    tcp_keepalive=True,
+    connect_timeout=5,
+    read_timeout=60
+)
+
+def _credentials_fingerprint(credentials: AWSCredentials) -> str:
+    """Short digest of the secret key so cache keys never hold the raw secret"""
+    return hashlib.blake2b(credentials.secretAccessKey.encode(), digest_size=16).hexdigest()
 
 class AWSResponse:
     def __init__(self, success: bool, data: Any = None, message: str = None, requires_credentials: bool = False):
@@ -21,33 +56,173 @@ class AWSResponse:
         self.message = message
         self.requires_credentials = requires_credentials
 
+# Shared AWSResponse templates for credential-related error codes. Callers
+# only read these, so one pre-built object per code replaces the elif
+# ladder previously duplicated across every AWS method.
+_RESP_INVALID_CREDENTIALS = AWSResponse(
+    success=False,
+    message="Invalid AWS credentials provided. Please check your Access Key ID and Secret Access Key.",
+    requires_credentials=True
+)
+_RESP_ACCESS_DENIED = AWSResponse(
+    success=False,
+    message="Your AWS credentials don't have permission for this operation. Please check your IAM permissions.",
+    requires_credentials=True
+)
+_CRED_ERROR_TABLE = {
+    'InvalidAccessKeyId': _RESP_INVALID_CREDENTIALS,
+    'SignatureDoesNotMatch': _RESP_INVALID_CREDENTIALS,
+    'InvalidClientTokenId': _RESP_INVALID_CREDENTIALS,
+    'AccessDenied': _RESP_ACCESS_DENIED,
+}
+
+def _client_error_response(e: ClientError) -> AWSResponse:
+    """Map a ClientError to the shared response for its error code"""
+    response = _CRED_ERROR_TABLE.get(e.response['Error']['Code'])
+    if response is not None:
+        return response
+    return AWSResponse(
+        success=False,
+        message=f"AWS error: {str(e)}",
+        requires_credentials=False
+    )
+
 class AWSTools:
     def __init__(self):
-        self.session = None
+        self.async_session = None
+        # Fingerprint of the credentials the current session was built from,
+        # so repeat calls with the same credentials skip session creation
+        self._session_creds_key = None
+        # Clients keyed by (service, access key, secret fingerprint, region);
+        # building a session + client costs tens of ms per call, so reuse
+        # them across requests that carry the same credentials
+        self._async_client_cache: "OrderedDict[tuple, Any]" = OrderedDict()
+        # Serializes client creation so two concurrent first requests for
+        # the same key don't both enter a client and leak the loser
+        self._client_create_lock = asyncio.Lock()
 
-    def _init_session(self, credentials: Optional[AWSCredentials] = None) -> Union[str, None]:
-        """Initialize AWS session with provided credentials"""
+    def _init_async_session(self, credentials: Optional[AWSCredentials] = None) -> Union[str, None]:
+        """Initialize aioboto3 session with provided credentials"""
         try:
             if credentials:
-                self.session = boto3.Session(
+                creds_key = (credentials.accessKeyId, _credentials_fingerprint(credentials), credentials.region)
+                if self.async_session is not None and self._session_creds_key == creds_key:
+                    return None
+                self.async_session = aioboto3.Session(
                     aws_access_key_id=credentials.accessKeyId,
                     aws_secret_access_key=credentials.secretAccessKey,
                     region_name=credentials.region
                 )
+                self._session_creds_key = creds_key
                 return None
             return "AWS credentials are required for this operation"
         except Exception as e:
             return f"Failed to initialize AWS session: {str(e)}"
 
-    def _get_client(self, service: str, credentials: Optional[AWSCredentials] = None):
-        """Get AWS service client with appropriate credentials"""
-        error = self._init_session(credentials)
-        if error:
-            raise Exception(error)
-        return self.session.client(service)
+    async def _get_async_client(self, service: str, credentials: Optional[AWSCredentials] = None):
+        """Get a cached async AWS service client with appropriate credentials"""
+        if not credentials:
+            raise Exception("AWS credentials are required for this operation")
+        cache_key = (service, credentials.accessKeyId, _credentials_fingerprint(credentials), credentials.region)
+        client = self._async_client_cache.get(cache_key)
+        if client is not None:
+            self._async_client_cache.move_to_end(cache_key)
+            return client
+        async with self._client_create_lock:
+            # Another task may have built this client while we waited
+            client = self._async_client_cache.get(cache_key)
+            if client is not None:
+                self._async_client_cache.move_to_end(cache_key)
+                return client
+            error = self._init_async_session(credentials)
+            if error:
+                raise Exception(error)
+            # Enter the client context here and keep it open so the client
+            # (and its pooled connections) survives across requests;
+            # evicted clients are closed as they drop out of the cache
+            client = await self.async_session.client(service, config=_CLIENT_CONFIG).__aenter__()
+            self._async_client_cache[cache_key] = client
+            if len(self._async_client_cache) > _CLIENT_CACHE_MAX_SIZE:
+                _, evicted = self._async_client_cache.popitem(last=False)
+                await evicted.__aexit__(None, None, None)
+        return client
+
+    @staticmethod
+    async def _bucket_metric(cloudwatch, bucket: str, metric_name: str, storage_type: str) -> Optional[float]:
+        """
+        Reads the latest daily CloudWatch datapoint for an S3 bucket metric.
+        CloudWatch already tracks BucketSizeBytes and NumberOfObjects per
+        bucket, so one datapoint replaces listing every object. Returns None
+        when no datapoint exists (new bucket or metrics not yet published),
+        in which case the caller falls back to enumeration.
+        """
+        now = datetime.now(timezone.utc)
+        response = await cloudwatch.get_metric_statistics(
+            Namespace='AWS/S3',
+            MetricName=metric_name,
+            Dimensions=[
+                {'Name': 'BucketName', 'Value': bucket},
+                {'Name': 'StorageType', 'Value': storage_type}
+            ],
+            StartTime=now - timedelta(days=2),
+            EndTime=now,
+            Period=86400,
+            Statistics=['Average']
+        )
+        datapoints = response.get('Datapoints')
+        if not datapoints:
+            return None
+        return max(datapoints, key=lambda point: point['Timestamp'])['Average']
+
+    @staticmethod
+    async def _count_prefix(s3, bucket: str, prefix: str) -> tuple:
+        """Counts objects and bytes under a single key prefix"""
+        file_count = 0
+        total_size = 0
+        paginator = s3.get_paginator('list_objects_v2')
+        async for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            contents = page.get('Contents')
+            if contents:
+                file_count += len(contents)
+                total_size += _sum_sizes(contents)
+        return file_count, total_size
+
+    async def _enumerate_bucket(self, s3, bucket: str) -> tuple:
+        """
+        Counts objects and bytes by listing the bucket. Top-level prefixes
+        are discovered with a delimiter pass and then listed in parallel,
+        exploiting S3's per-prefix throughput; keys at the bucket root are
+        counted during the same discovery pass. Fixed hex-prefix sharding
+        was considered but silently misses keys outside [0-9a-f].
+        """
+        file_count = 0
+        total_size = 0
+        prefixes = []
+        paginator = s3.get_paginator('list_objects_v2')
+        async for page in paginator.paginate(Bucket=bucket, Delimiter='/'):
+            contents = page.get('Contents')
+            if contents:
+                file_count += len(contents)
+                total_size += _sum_sizes(contents)
+            prefixes.extend(map(itemgetter('Prefix'), page.get('CommonPrefixes', ())))
+
+        if prefixes:
+            semaphore = asyncio.Semaphore(16)
+
+            async def count_one(prefix: str) -> tuple:
+                async with semaphore:
+                    return await self._count_prefix(s3, bucket, prefix)
+
+            results = await asyncio.gather(*[count_one(prefix) for prefix in prefixes])
+            for count, size in results:
+                file_count += count
+                total_size += size
+        return file_count, total_size
 
     async def get_s3_bucket_sizes(self, credentials: Optional[AWSCredentials] = None) -> AWSResponse:
         """Returns total size of all accessible S3 buckets"""
+        if credentials is None:
+            credentials = CREDENTIALS_CTX.get()
         if not credentials:
             return AWSResponse(
                 success=False,
@@ -56,23 +231,31 @@ class AWSTools:
             )
 
         try:
-            s3 = self._get_client('s3', credentials)
-            buckets = []
-            response = s3.list_buckets()
-            
-            for bucket in response['Buckets']:
-                size = 0
-                paginator = s3.get_paginator('list_objects_v2')
-                for page in paginator.paginate(Bucket=bucket['Name']):
-                    if 'Contents' in page:
-                        for obj in page['Contents']:
-                            size += obj['Size']
-                buckets.append({
-                    'name': bucket['Name'],
-                    'size_bytes': size,
-                    'size_mb': round(size / (1024 * 1024), 2)
-                })
-            
+            s3 = await self._get_async_client('s3', credentials)
+            cloudwatch = await self._get_async_client('cloudwatch', credentials)
+
+            response = await s3.list_buckets()
+            bucket_names = [bucket['Name'] for bucket in response['Buckets']]
+
+            # Buckets are independent, so enumerate them concurrently
+            # with a cap on how many we hit at once
+            semaphore = asyncio.Semaphore(16)
+
+            async def bucket_size(name: str) -> Dict[str, Any]:
+                async with semaphore:
+                    size = await self._bucket_metric(cloudwatch, name, 'BucketSizeBytes', 'StandardStorage')
+                    if size is None:
+                        # No datapoint yet; fall back to walking the objects
+                        _, size = await self._enumerate_bucket(s3, name)
+                    size = int(size)
+                    return {
+                        'name': name,
+                        'size_bytes': size,
+                        'size_mb': round(size / (1024 * 1024), 2)
+                    }
+
+            buckets = list(await asyncio.gather(*[bucket_size(name) for name in bucket_names]))
+
             return AWSResponse(
                 success=True,
                 data=buckets,
@@ -80,31 +263,7 @@ class AWSTools:
             )
                 
         except ClientError as e:
-            error_code = e.response['Error']['Code']
-            if error_code == 'InvalidAccessKeyId':
-                return AWSResponse(
-                    success=False,
-                    message="The AWS Access Key ID you provided is invalid. Please check your credentials.",
-                    requires_credentials=True
-                )
-            elif error_code == 'SignatureDoesNotMatch':
-                return AWSResponse(
-                    success=False,
-                    message="The AWS Secret Access Key you provided is invalid. Please check your credentials.",
-                    requires_credentials=True
-                )
-            elif error_code == 'AccessDenied':
-                return AWSResponse(
-                    success=False,
-                    message="Your AWS credentials don't have permission to list S3 buckets. Please check your IAM permissions.",
-                    requires_credentials=True
-                )
-            else:
-                return AWSResponse(
-                    success=False,
-                    message=f"AWS error: {str(e)}",
-                    requires_credentials=False
-                )
+            return _client_error_response(e)
         except Exception as e:
             return AWSResponse(
                 success=False,
@@ -114,6 +273,8 @@ class AWSTools:
 
     async def list_ec2_instances(self, credentials: Optional[AWSCredentials] = None) -> AWSResponse:
         """Returns list of EC2 instances with their details"""
+        if credentials is None:
+            credentials = CREDENTIALS_CTX.get()
         if not credentials:
             return AWSResponse(
                 success=False,
@@ -122,46 +283,41 @@ class AWSTools:
             )
 
         try:
-            ec2 = self._get_client('ec2', credentials)
-            response = ec2.describe_instances()
-            instances = []
-            
+            ec2 = await self._get_async_client('ec2', credentials)
+            response = await ec2.describe_instances()
+
+            # Columnar layout: one list per field instead of one dict with
+            # five string keys per instance. Accounts with thousands of
+            # instances allocate five lists total rather than thousands of
+            # small dicts, and orjson serializes flat arrays faster.
+            ids = []
+            types = []
+            states = []
+            public_ips = []
+            private_ips = []
+
             for reservation in response['Reservations']:
                 for instance in reservation['Instances']:
-                    instances.append({
-                        'id': instance['InstanceId'],
-                        'type': instance['InstanceType'],
-                        'state': instance['State']['Name'],
-                        'public_ip': instance.get('PublicIpAddress', 'N/A'),
-                        'private_ip': instance.get('PrivateIpAddress', 'N/A')
-                    })
-            
+                    ids.append(instance['InstanceId'])
+                    types.append(instance['InstanceType'])
+                    states.append(instance['State']['Name'])
+                    public_ips.append(instance.get('PublicIpAddress', 'N/A'))
+                    private_ips.append(instance.get('PrivateIpAddress', 'N/A'))
+
             return AWSResponse(
                 success=True,
-                data=instances,
-                message=f"Successfully retrieved information for {len(instances)} instance(s)"
+                data={
+                    'ids': ids,
+                    'types': types,
+                    'states': states,
+                    'public_ips': public_ips,
+                    'private_ips': private_ips
+                },
+                message=f"Successfully retrieved information for {len(ids)} instance(s)"
             )
                 
         except ClientError as e:
-            error_code = e.response['Error']['Code']
-            if error_code in ['InvalidAccessKeyId', 'SignatureDoesNotMatch']:
-                return AWSResponse(
-                    success=False,
-                    message="Invalid AWS credentials provided. Please check your Access Key ID and Secret Access Key.",
-                    requires_credentials=True
-                )
-            elif error_code == 'AccessDenied':
-                return AWSResponse(
-                    success=False,
-                    message="Your AWS credentials don't have permission to list EC2 instances. Please check your IAM permissions.",
-                    requires_credentials=True
-                )
-            else:
-                return AWSResponse(
-                    success=False,
-                    message=f"AWS error: {str(e)}",
-                    requires_credentials=False
-                )
+            return _client_error_response(e)
         except Exception as e:
             return AWSResponse(
                 success=False,
@@ -170,6 +326,8 @@ class AWSTools:
             )
 
     async def describe_iam_role(self, role_name: str, credentials: Optional[AWSCredentials] = None) -> AWSResponse:
+        if credentials is None:
+            credentials = CREDENTIALS_CTX.get()
         if not credentials:
             return AWSResponse(
                 success=False,
@@ -178,39 +336,27 @@ class AWSTools:
             )
 
         try:
-            iam = self._get_client('iam', credentials)
-            role = iam.get_role(RoleName=role_name)
-            policies = iam.list_attached_role_policies(RoleName=role_name)
-            
+            iam = await self._get_async_client('iam', credentials)
+            # The three lookups are independent, so issue them in one
+            # round-trip's worth of latency instead of three
+            role, policies, inline_policies = await asyncio.gather(
+                iam.get_role(RoleName=role_name),
+                iam.list_attached_role_policies(RoleName=role_name),
+                iam.list_role_policies(RoleName=role_name)
+            )
+
             return AWSResponse(
                 success=True,
                 data={
                     'role': role['Role'],
-                    'attached_policies': policies['AttachedPolicies']
+                    'attached_policies': policies['AttachedPolicies'],
+                    'inline_policy_names': inline_policies['PolicyNames']
                 },
                 message=f"Successfully retrieved details for IAM role '{role_name}'"
             )
                 
         except ClientError as e:
-            error_code = e.response['Error']['Code']
-            if error_code in ['InvalidAccessKeyId', 'SignatureDoesNotMatch']:
-                return AWSResponse(
-                    success=False,
-                    message="Invalid AWS credentials provided. Please check your Access Key ID and Secret Access Key.",
-                    requires_credentials=True
-                )
-            elif error_code == 'AccessDenied':
-                return AWSResponse(
-                    success=False,
-                    message="Your AWS credentials don't have permission to access IAM roles. Please check your IAM permissions.",
-                    requires_credentials=True
-                )
-            else:
-                return AWSResponse(
-                    success=False,
-                    message=f"AWS error: {str(e)}",
-                    requires_credentials=False
-                )
+            return _client_error_response(e)
         except Exception as e:
             return AWSResponse(
                 success=False,
@@ -220,6 +366,8 @@ class AWSTools:
 
     async def get_s3_bucket_file_count(self, bucket_name: str = None, credentials: Optional[AWSCredentials] = None) -> AWSResponse:
         """Returns the number of files in specified S3 bucket, or all buckets if none specified"""
+        if credentials is None:
+            credentials = CREDENTIALS_CTX.get()
         if not credentials:
             return AWSResponse(
                 success=False,
@@ -228,43 +376,39 @@ class AWSTools:
             )
 
         try:
-            s3 = self._get_client('s3', credentials)
-            bucket_stats = []
-            
+            s3 = await self._get_async_client('s3', credentials)
+            cloudwatch = await self._get_async_client('cloudwatch', credentials)
+
             try:
                 # If no bucket specified, list all buckets
                 if not bucket_name:
-                    response = s3.list_buckets()
+                    response = await s3.list_buckets()
                     buckets = [bucket['Name'] for bucket in response['Buckets']]
                 else:
                     buckets = [bucket_name]
 
-                for bucket in buckets:
-                    file_count = 0
-                    total_size = 0
-                    
-                    # Use paginator to handle buckets with more than 1000 objects
-                    paginator = s3.get_paginator('list_objects_v2')
-                    try:
-                        for page in paginator.paginate(Bucket=bucket):
-                            if 'Contents' in page:
-                                file_count += len(page['Contents'])
-                                total_size += sum(obj['Size'] for obj in page['Contents'])
-                                
-                        bucket_stats.append({
+                # Count each bucket concurrently with a cap on parallelism;
+                # the paginator handles buckets with more than 1000 objects
+                semaphore = asyncio.Semaphore(16)
+
+                async def count_bucket(bucket: str) -> Dict[str, Any]:
+                    async with semaphore:
+                        file_count = await self._bucket_metric(cloudwatch, bucket, 'NumberOfObjects', 'AllStorageTypes')
+                        total_size = await self._bucket_metric(cloudwatch, bucket, 'BucketSizeBytes', 'StandardStorage')
+                        if file_count is None or total_size is None:
+                            # No datapoints yet; fall back to walking the
+                            # objects, sharded by top-level prefix
+                            file_count, total_size = await self._enumerate_bucket(s3, bucket)
+                        file_count = int(file_count)
+                        total_size = int(total_size)
+                        return {
                             'bucket_name': bucket,
                             'file_count': file_count,
                             'total_size_bytes': total_size,
                             'total_size_mb': round(total_size / (1024 * 1024), 2)
-                        })
-                    except ClientError as e:
-                        if e.response['Error']['Code'] == 'NoSuchBucket':
-                            return AWSResponse(
-                                success=False,
-                                message=f"The specified bucket '{bucket}' does not exist",
-                                requires_credentials=False
-                            )
-                        raise
+                        }
+
+                bucket_stats = list(await asyncio.gather(*[count_bucket(bucket) for bucket in buckets]))
 
                 # Format response message
                 if len(bucket_stats) == 1:
@@ -282,31 +426,13 @@ class AWSTools:
                 )
 
             except ClientError as e:
-                error_code = e.response['Error']['Code']
-                if error_code == 'NoSuchBucket':
+                if e.response['Error']['Code'] == 'NoSuchBucket':
                     return AWSResponse(
                         success=False,
                         message=f"The specified bucket '{bucket_name}' does not exist",
                         requires_credentials=False
                     )
-                elif error_code in ['InvalidAccessKeyId', 'SignatureDoesNotMatch']:
-                    return AWSResponse(
-                        success=False,
-                        message="Invalid AWS credentials provided. Please check your Access Key ID and Secret Access Key.",
-                        requires_credentials=True
-                    )
-                elif error_code == 'AccessDenied':
-                    return AWSResponse(
-                        success=False,
-                        message="Your AWS credentials don't have permission to list objects in S3 buckets. Please check your IAM permissions.",
-                        requires_credentials=True
-                    )
-                else:
-                    return AWSResponse(
-                        success=False,
-                        message=f"AWS error: {str(e)}",
-                        requires_credentials=False
-                    )
+                return _client_error_response(e)
 
         except Exception as e:
             return AWSResponse(
@@ -0,0 +1,28 @@
+import os
+
+from uvicorn.workers import UvicornWorker
+
+# Production server configuration. The app is fully async (aioboto3 +
+# AsyncOpenAI), so throughput comes from many async workers on a fast
+# event loop rather than threads. Start with:
+#
+#   gunicorn app.main:app -c gunicorn_conf.py
+
+class CloudPilotWorker(UvicornWorker):
+    # uvloop and httptools are substantially faster than the stdlib event
+    # loop and h11 parser; the concurrency limit sheds load with a 503
+    # before the event loop saturates
+    CONFIG_KWARGS = {
+        "loop": "uvloop",
+        "http": "httptools",
+        "limit_concurrency": 200,
+        "backlog": 2048,
+    }
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+# Import the app (boto3 service models, OpenAI client, tool schemas) once
+# in the parent so workers share it via copy-on-write
+preload_app = True
+workers = (2 * os.cpu_count()) + 1
+worker_class = "gunicorn_conf.CloudPilotWorker"
+backlog = 2048